@@ -1,48 +1,34 @@
 import anthropic
+import asyncio
 import base64
+import functools
+import hashlib
+import io
 import json
 import os
-import re
+import sys
+import urllib.parse
+import numpy as np
 from dotenv import load_dotenv
-from typing import Optional, Dict, List
+from PIL import Image
+from tenacity import (RetryCallState, retry, retry_if_exception_type, stop_after_attempt,
+                      wait_exponential_jitter)
+from typing import Optional, Dict, List, Tuple, Union
 
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the standard json module
+    orjson = None
 
-def floorplan_png_to_json(png_path: str, api_key: Optional[str] = None, output_path: Optional[str] = None) -> Dict:
-    """
-    Convert a floor plan PNG to structured JSON with walls and rooms.
-
-    Args:
-        png_path: Path to the floor plan PNG file
-        api_key: Your Anthropic API key (optional if set in environment)
-        output_path: Optional path for output JSON file
-
-    Returns:
-        dict: JSON with walls (with coordinates) and rooms (with center points)
-    """
+try:
+    import msgspec
+except ImportError:  # Optional: falls back to validate_and_fix_structure
+    msgspec = None
 
-    # Load environment variables and get API key
-    load_dotenv()
-    api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
 
-    if not api_key:
-        raise ValueError(
-            "API key not found. Please set ANTHROPIC_API_KEY environment variable "
-            "or pass api_key parameter."
-        )
-
-    # Validate input file
-    if not os.path.exists(png_path):
-        raise FileNotFoundError(f"Floor plan image not found: {png_path}")
-
-    # Read and encode the PNG file
-    with open(png_path, 'rb') as image_file:
-        image_data = base64.standard_b64encode(image_file.read()).decode('utf-8')
-
-    # Initialize the Anthropic client
-    client = anthropic.Anthropic(api_key=api_key)
-
-    # Enhanced prompt with emphasis on detecting closely-spaced parallel walls
-    prompt = """Analyze this floor plan image and extract ALL architectural elements in the following EXACT JSON format:
+# Enhanced prompt with emphasis on detecting closely-spaced parallel walls.
+# Sent as a cached system prompt, so keep it byte-for-byte stable between calls.
+PROMPT_INSTRUCTIONS = """Analyze this floor plan image and extract ALL architectural elements in the following EXACT JSON format:
 
 {
   "walls": [
@@ -116,88 +102,806 @@ VERIFICATION CHECKLIST before finalizing:
 ✓ JSON is valid and complete
 ✓ No walls are merged or missing"""
 
+# Short per-request directive sent alongside the image
+USER_DIRECTIVE = "Extract the floor plan per the system instructions."
+
+MODEL = "claude-sonnet-4-20250514"
+
+# Changes whenever the prompt text changes, invalidating cached responses
+PROMPT_VERSION = hashlib.sha256(
+    (PROMPT_INSTRUCTIONS + USER_DIRECTIVE).encode('utf-8')
+).hexdigest()[:16]
+
+# Standard room names requested in the prompt, interned so results share them
+ROOM_NAMES = {name: sys.intern(name) for name in (
+    'OFFICE', 'BEDROOM', 'BED', 'BATH', 'BATHROOM', 'KITCHEN', 'LIVING ROOM',
+    'DINING ROOM', 'CLOSET', 'HALLWAY', 'ENTRY', 'LAUNDRY', 'UNKNOWN',
+)}
+
+# Files larger than this are read and base64-encoded in chunks
+STREAMING_THRESHOLD = 1_000_000
+
+# Read size for chunked file access; a multiple of 3 so base64 chunks need no padding
+STREAM_CHUNK_SIZE = 3 * 512 * 1024
+
+# Walls compared per block in detect_close_parallel_walls
+PAIR_BLOCK_SIZE = 512
+
+# Default longest image edge sent to the API (a multiple of the 14px ViT patch size)
+DEFAULT_MAX_EDGE = 1568
+
+# Default location of the response cache (relative to the working directory)
+DEFAULT_CACHE_DIR = ".floorplan_cache"
+
+# Retries for transient API errors (clients are created with SDK retries disabled)
+RETRY_ATTEMPTS = 5
+RETRY_MAX_WAIT = 30
+RETRYABLE_ERRORS = tuple(
+    error for error in (
+        anthropic.RateLimitError,
+        anthropic.APIConnectionError,
+        anthropic.InternalServerError,
+        getattr(anthropic, 'OverloadedError', None),  # 529, only in newer SDKs
+    ) if error is not None
+)
+
+# Prompt cache lifetime for batch runs, which outlive the 5 minute default
+BATCH_CACHE_TTL = "1h"
+
+# Shared API clients keyed by API key, so connections are reused between calls
+_CLIENTS: Dict[str, anthropic.Anthropic] = {}
+
+
+def floorplan_png_to_json(png_path: Optional[str] = None, api_key: Optional[str] = None, output_path: Optional[str] = None,
+                          cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                          max_edge: Optional[int] = DEFAULT_MAX_EDGE, verbose: bool = False,
+                          image_url: Optional[str] = None) -> Dict:
+    """
+    Convert a floor plan PNG to structured JSON with walls and rooms.
+
+    Args:
+        png_path: Path to the floor plan PNG file (may be None when image_url is given)
+        api_key: Your Anthropic API key (optional if set in environment)
+        output_path: Optional path for output JSON file
+        cache_dir: Directory for cached responses keyed by image content
+                   (None disables the response cache)
+        max_edge: Longest image edge sent to the API; larger images are
+                  downscaled first (None sends the image unchanged).
+                  Coordinates are always returned in original image pixels.
+        verbose: Print an extraction summary, including the closely-spaced
+                 parallel wall analysis, and the prompt cache usage
+        image_url: Optional URL Anthropic can fetch the image from. The image
+                   is then not read, downscaled, cached or base64-encoded
+                   locally, and coordinates are in the fetched image's pixels.
+
+    Returns:
+        dict: JSON with walls (with coordinates) and rooms (with center points)
+    """
+
+    api_key = resolve_api_key(api_key)
+
+    if image_url:
+        result = extract_floorplan(get_client(api_key), url_image_source(image_url), verbose=verbose)
+
+        if output_path:
+            save_json_output(result, output_path)
+        if verbose:
+            print_summary(result)
+
+        return result
+
+    if png_path is None:
+        raise ValueError("Either png_path or image_url must be provided.")
+
+    # Validate input file
+    if not os.path.exists(png_path):
+        raise FileNotFoundError(f"Floor plan image not found: {png_path}")
+
+    # Reuse the stored result if this exact image was already processed
+    # (the key hashes the whole file, so it is only built when caching is on)
+    cache_key = response_cache_key(png_path, max_edge) if cache_dir else None
+    result = load_cached_response(cache_dir, cache_key) if cache_dir else None
+
+    if result is None:
+        # Read, downscale and encode the PNG file
+        image_data, scale_x, scale_y = encode_image_for_request(png_path, max_edge)
+
+        # Reuse the shared Anthropic client for this key
+        client = get_client(api_key)
+
+        result = extract_floorplan(client, base64_image_source(image_data), verbose=verbose)
+        scale_coordinates(result, scale_x, scale_y)
+
+        if cache_dir:
+            store_cached_response(cache_dir, cache_key, result)
+
+    # Save to file if output path is provided
+    if output_path:
+        save_json_output(result, output_path)
+
+    # Print summary
+    if verbose:
+        print_summary(result)
+
+    return result
+
+
+async def floorplan_png_to_json_batch(png_paths: List[str], api_key: Optional[str] = None,
+                                      output_dir: Optional[str] = None,
+                                      cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                                      concurrency: int = 4,
+                                      max_edge: Optional[int] = DEFAULT_MAX_EDGE,
+                                      verbose: bool = False) -> List[Dict]:
+    """
+    Convert several floor plan PNGs concurrently.
+
+    Requests share one AsyncAnthropic client (and its connection pool) for the
+    whole batch, and at most `concurrency` floor plans are in flight at any
+    time.
+
+    Args:
+        png_paths: Paths to the floor plan PNG files. http(s) URLs are passed
+                   to the API as URL image sources instead (see image_url in
+                   floorplan_png_to_json)
+        api_key: Your Anthropic API key (optional if set in environment)
+        output_dir: Optional directory for one <name>.json output per image
+        cache_dir: Directory for cached responses keyed by image content
+                   (None disables the response cache)
+        concurrency: Maximum number of simultaneous API requests
+        max_edge: Longest image edge sent to the API (see floorplan_png_to_json)
+        verbose: Print an extraction summary and the prompt cache usage for
+                 each floor plan
+
+    Returns:
+        list: One result dict per input path, in input order
+    """
+    api_key = resolve_api_key(api_key)
+
+    # Validate all input files before sending anything
+    for png_path in png_paths:
+        if not is_image_url(png_path) and not os.path.exists(png_path):
+            raise FileNotFoundError(f"Floor plan image not found: {png_path}")
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    # Resolve response cache hits first; only the misses (and URLs) reach the API below
+    lookups = await asyncio.gather(*[
+        asyncio.to_thread(lookup_cached_response, png_path, cache_dir, max_edge)
+        for png_path in png_paths
+    ])
+    pending = [index for index, (_, cached) in enumerate(lookups) if cached is None]
+
+    # One client (and connection pool) per batch; async pools are bound to this event loop,
+    # so the client is closed here rather than cached across asyncio.run calls
+    client = anthropic.AsyncAnthropic(api_key=api_key, max_retries=0)
+    semaphore = asyncio.Semaphore(concurrency)
+    usage_log = []
+
+    def convert(index: int):
+        cache_key, cached = lookups[index]
+        return process_floorplan_async(client, semaphore, png_paths[index], output_dir, cache_dir, max_edge,
+                                       usage_log, cache_key=cache_key, cached_result=cached, verbose=verbose)
+
+    results = [None] * len(png_paths)
+    remaining = list(range(len(png_paths)))
     try:
-        # Send the image to Claude for analysis
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=16384,  # Increased for complex floor plans with many walls
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": "image/png",
-                                "data": image_data,
-                            },
-                        },
-                        {
-                            "type": "text",
-                            "text": prompt
-                        }
-                    ],
-                }
-            ],
+        # Send the first API request on its own: it writes the prompt cache (when the prompt
+        # is long enough to be cached), so the concurrent requests after it read that entry
+        # instead of each paying for their own cache write
+        if len(pending) > 1:
+            first = pending[0]
+            results[first] = await convert(first)
+            remaining.remove(first)
+
+        for index, result in zip(remaining, await asyncio.gather(*[convert(index) for index in remaining])):
+            results[index] = result
+    finally:
+        await client.close()
+
+    print_cache_hit_rate(usage_log, verbose)
+
+    if verbose:
+        for result in results:
+            print_summary(result)
+
+    return results
+
+
+async def process_floorplan_async(client: anthropic.AsyncAnthropic, semaphore: asyncio.Semaphore,
+                                  png_path: str, output_dir: Optional[str],
+                                  cache_dir: Optional[str], max_edge: Optional[int],
+                                  usage_log: Optional[List] = None, cache_key: Optional[str] = None,
+                                  cached_result: Optional[Dict] = None, verbose: bool = False) -> Dict:
+    """
+    Convert one floor plan inside the batch, holding a semaphore slot throughout.
+
+    cache_key and cached_result come from lookup_cached_response when the
+    caller has already checked the response cache.
+    """
+    if cached_result is not None:
+        if output_dir:
+            name = os.path.splitext(os.path.basename(png_path))[0]
+            output_path = os.path.join(output_dir, f"{name}.json")
+            await asyncio.to_thread(save_json_output, cached_result, output_path)
+        return cached_result
+
+    async with semaphore:
+        if is_image_url(png_path):
+            result = await extract_floorplan_async(client, url_image_source(png_path),
+                                                   cache_ttl=BATCH_CACHE_TTL, usage_log=usage_log,
+                                                   verbose=verbose)
+            if output_dir:
+                output_path = os.path.join(output_dir, f"{url_output_name(png_path)}.json")
+                await asyncio.to_thread(save_json_output, result, output_path)
+            return result
+
+        # Keep file I/O off the event loop
+        if cache_key is None:
+            cache_key, result = await asyncio.to_thread(lookup_cached_response, png_path, cache_dir, max_edge)
+        else:
+            result = None
+
+        if result is None:
+            image_data, scale_x, scale_y = await asyncio.to_thread(encode_image_for_request, png_path, max_edge)
+
+            result = await extract_floorplan_async(client, base64_image_source(image_data),
+                                                   cache_ttl=BATCH_CACHE_TTL, usage_log=usage_log,
+                                                   verbose=verbose)
+            scale_coordinates(result, scale_x, scale_y)
+
+            if cache_dir:
+                await asyncio.to_thread(store_cached_response, cache_dir, cache_key, result)
+
+        if output_dir:
+            name = os.path.splitext(os.path.basename(png_path))[0]
+            output_path = os.path.join(output_dir, f"{name}.json")
+            await asyncio.to_thread(save_json_output, result, output_path)
+
+    return result
+
+
+def resolve_api_key(api_key: Optional[str] = None) -> str:
+    """Return the given API key, falling back to ANTHROPIC_API_KEY from the environment/.env."""
+    # Load environment variables (once per process) and get API key
+    load_env_once()
+    api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
+
+    if not api_key:
+        raise ValueError(
+            "API key not found. Please set ANTHROPIC_API_KEY environment variable "
+            "or pass api_key parameter."
         )
 
-        # Extract the response text
-        response_text = message.content[0].text
+    return api_key
+
+
+@functools.lru_cache(maxsize=None)
+def load_env_once() -> None:
+    """Load the .env file on first use only, instead of re-reading it on every call."""
+    load_dotenv()
+
+
+def get_client(api_key: str) -> anthropic.Anthropic:
+    """Return the shared Anthropic client for an API key, creating it on first use."""
+    client = _CLIENTS.get(api_key)
+    if client is None:
+        client = anthropic.Anthropic(api_key=api_key, max_retries=0)
+        _CLIENTS[api_key] = client
+    return client
+
+
+def iter_file_chunks(path: str, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Yield a file's contents in fixed-size chunks."""
+    with open(path, 'rb', buffering=chunk_size) as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+def encode_file_base64(path: str, size: Optional[int] = None) -> str:
+    """
+    Base64-encode a file.
+
+    Pass `size` when the caller already has it from os.stat, to skip another stat.
+
+    Small files are encoded in one shot. Larger files are encoded chunk by
+    chunk, so the raw file is never held in memory next to its encoded copy.
+    The chunk size is a multiple of 3, so no chunk produces padding and the
+    joined output equals a one-shot encode.
+    """
+    if size is None:
+        size = os.path.getsize(path)
+
+    if size <= STREAMING_THRESHOLD:
+        with open(path, 'rb') as f:
+            return base64.standard_b64encode(f.read()).decode('ascii')
+
+    return ''.join(base64.standard_b64encode(chunk).decode('ascii')
+                   for chunk in iter_file_chunks(path))
+
+
+def encode_image_for_request(png_path: str, max_edge: Optional[int]) -> Tuple[str, float, float]:
+    """
+    Base64-encode a floor plan, downscaling it first if it exceeds max_edge.
+
+    Floor plans are line art and survive downscaling well, while a smaller
+    image costs fewer input tokens and less request latency.
+
+    Args:
+        png_path: Path to the PNG file
+        max_edge: Maximum width/height in pixels (None disables downscaling)
+
+    Returns:
+        tuple: (base64 data, x scale, y scale), where the scales map
+               coordinates in the sent image back to the original image
+    """
+    with Image.open(png_path) as image:
+        width, height = image.size
+        if not max_edge or max(width, height) <= max_edge:
+            return encode_file_base64(png_path), 1.0, 1.0
+
+        # Palette and bilevel images would be resized with nearest neighbour
+        if image.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+            image = image.convert('RGBA')
+
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG', optimize=True)
+        scale_x = width / image.width
+        scale_y = height / image.height
+
+    return base64.standard_b64encode(buffer.getvalue()).decode('ascii'), scale_x, scale_y
 
-        # Clean up the response
-        response_text = clean_json_response(response_text)
 
-        # Parse the JSON
-        result = json.loads(response_text)
+def scale_coordinates(result: Dict, scale_x: float, scale_y: float) -> None:
+    """Scale all wall and room coordinates of a result in place."""
+    if scale_x == 1.0 and scale_y == 1.0:
+        return
 
-        # Validate the structure
-        result = validate_and_fix_structure(result)
+    for wall in result.get('walls', []):
+        for point in (wall['start_point'], wall['end_point']):
+            point['x'] *= scale_x
+            point['y'] *= scale_y
 
+    for room in result.get('rooms', []):
+        room['center_point']['x'] *= scale_x
+        room['center_point']['y'] *= scale_y
+
+    if '_walls_xy' in result:
+        result['_walls_xy'] *= np.array([scale_x, scale_y, scale_x, scale_y])
+
+
+def is_image_url(path: str) -> bool:
+    """Return True if a batch input is an http(s) URL rather than a local path."""
+    return path.startswith(('http://', 'https://'))
+
+
+def url_output_name(image_url: str) -> str:
+    """Derive an output file name (without extension) from an image URL."""
+    path = urllib.parse.urlparse(image_url).path
+    return os.path.splitext(os.path.basename(path))[0] or hashlib.sha256(image_url.encode('utf-8')).hexdigest()[:16]
+
+
+def base64_image_source(image_data: str) -> Dict:
+    """Build an image source block for base64-encoded PNG data."""
+    return {
+        "type": "base64",
+        "media_type": "image/png",
+        "data": image_data,
+    }
+
+
+def url_image_source(image_url: str) -> Dict:
+    """Build an image source block that Anthropic fetches from a URL."""
+    return {
+        "type": "url",
+        "url": image_url,
+    }
+
+
+def build_request(image_source: Dict, cache_ttl: Optional[str] = None) -> Dict:
+    """
+    Build the messages.create keyword arguments for a floor plan image.
+
+    Args:
+        image_source: Image source block (see base64_image_source / url_image_source)
+        cache_ttl: Optional prompt cache lifetime passed to build_system_prompt
+
+    Returns:
+        dict: Keyword arguments for client.messages.create
+    """
+    return {
+        "model": MODEL,
+        "max_tokens": 16384,  # Increased for complex floor plans with many walls
+        "system": build_system_prompt(cache_ttl),
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image",
+                        "source": image_source,
+                    },
+                    {
+                        "type": "text",
+                        "text": USER_DIRECTIVE
+                    }
+                ],
+            }
+        ],
+    }
+
+
+def extract_floorplan(client: anthropic.Anthropic, image_source: Dict, verbose: bool = False) -> Dict:
+    """
+    Send a floor plan image to Claude and return the validated result.
+
+    Args:
+        client: Anthropic client used for the request
+        image_source: Image source block (see base64_image_source / url_image_source)
+        verbose: Print the request's prompt cache usage
+
+    Returns:
+        dict: Validated walls and rooms, or empty lists plus an "error" entry
+    """
+    try:
+        # Send the image to Claude for analysis
+        response_text = stream_floorplan_text(client, build_request(image_source), verbose)
+        return parse_floorplan_text(response_text)
+    except Exception as e:
+        return api_error_result(e)
+
+
+async def extract_floorplan_async(client: anthropic.AsyncAnthropic, image_source: Dict,
+                                  cache_ttl: Optional[str] = None,
+                                  usage_log: Optional[List] = None, verbose: bool = False) -> Dict:
+    """
+    Async counterpart of extract_floorplan for use with AsyncAnthropic.
+
+    If usage_log is given, each request's usage block is appended to it.
+    """
+    try:
+        response_text = await stream_floorplan_text_async(client, build_request(image_source, cache_ttl),
+                                                          usage_log, verbose)
+        return parse_floorplan_text(response_text)
+    except Exception as e:
+        return api_error_result(e)
+
+
+_exponential_backoff = wait_exponential_jitter(initial=1, max=RETRY_MAX_WAIT)
+
+
+def wait_retry_after(retry_state: RetryCallState) -> float:
+    """Wait for the server's retry-after hint when given, else back off exponentially with jitter."""
+    error = retry_state.outcome.exception()
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            return min(float(response.headers.get('retry-after')), RETRY_MAX_WAIT)
+        except (TypeError, ValueError):
+            pass
+    return _exponential_backoff(retry_state)
+
+
+# Retry transient API failures (rate limits, overload, 5xx, connection errors)
+retry_transient_errors = retry(
+    stop=stop_after_attempt(RETRY_ATTEMPTS),
+    wait=wait_retry_after,
+    retry=retry_if_exception_type(RETRYABLE_ERRORS),
+    reraise=True,
+)
+
+
+@retry_transient_errors
+def stream_floorplan_text(client: anthropic.Anthropic, request: Dict, verbose: bool = False) -> str:
+    """
+    Stream a response and return its text.
+
+    Reading stops as soon as the top-level JSON object is complete, so any
+    trailing markdown or commentary is never waited for. With verbose, the
+    request's prompt cache usage is printed.
+    """
+    scanner = JsonObjectScanner()
+    parts = []
+
+    with client.messages.stream(**request) as stream:
+        for event in stream:
+            if event.type == 'message_start':
+                # Report prompt cache usage for this request
+                if verbose:
+                    print_cache_usage(event.message.usage)
+            elif event.type == 'content_block_delta' and event.delta.type == 'text_delta':
+                parts.append(event.delta.text)
+                if scanner.feed(event.delta.text):
+                    break
+
+    return ''.join(parts)
+
+
+@retry_transient_errors
+async def stream_floorplan_text_async(client: anthropic.AsyncAnthropic, request: Dict,
+                                      usage_log: Optional[List] = None, verbose: bool = False) -> str:
+    """Async counterpart of stream_floorplan_text, optionally recording usage in usage_log."""
+    scanner = JsonObjectScanner()
+    parts = []
+
+    async with client.messages.stream(**request) as stream:
+        async for event in stream:
+            if event.type == 'message_start':
+                if verbose:
+                    print_cache_usage(event.message.usage)
+                if usage_log is not None:
+                    usage_log.append(event.message.usage)
+            elif event.type == 'content_block_delta' and event.delta.type == 'text_delta':
+                parts.append(event.delta.text)
+                if scanner.feed(event.delta.text):
+                    break
+
+    return ''.join(parts)
+
+
+class JsonObjectScanner:
+    """Track brace depth over streamed text to detect when the first JSON object closes."""
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> bool:
+        """Consume more text; return True once the top-level object is complete."""
+        for char in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                # Quotes only matter inside the object; prose before it is ignored
+                self.in_string = self.started
+            elif char == '{':
+                self.depth += 1
+                self.started = True
+            elif char == '}' and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    return True
+        return False
+
+
+def parse_floorplan_text(response_text: str) -> Dict:
+    """Parse and validate the floor plan JSON from Claude's response text."""
+    # Clean up the response
+    response_text = clean_json_response(response_text)
+
+    try:
+        # Parse and validate the JSON
+        return decode_floorplan(response_text)
     except json.JSONDecodeError as e:
         print(f"❌ Failed to parse JSON: {e}")
         print(f"Raw response preview: {response_text[:500]}...")
-        result = {
+        return {
             "walls": [],
             "rooms": [],
             "error": f"Failed to parse response: {str(e)}",
             "raw_response": response_text
         }
-    except Exception as e:
-        print(f"❌ Error during API call: {e}")
-        result = {
-            "walls": [],
-            "rooms": [],
-            "error": f"API error: {str(e)}"
+
+
+def api_error_result(error: Exception) -> Dict:
+    """Build the empty result returned when the API call fails."""
+    print(f"❌ Error during API call: {error}")
+    return {
+        "walls": [],
+        "rooms": [],
+        "error": f"API error: {str(error)}"
+    }
+
+
+def response_cache_key(png_path: str, max_edge: Optional[int] = None) -> str:
+    """
+    Build the response cache key for an image file.
+
+    The key covers the raw PNG bytes, the model, the prompt version and the
+    downscaling limit, so editing the prompt or switching models never
+    returns stale results.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{MODEL}:{PROMPT_VERSION}:{max_edge}:".encode('utf-8'))
+    for chunk in iter_file_chunks(png_path):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def lookup_cached_response(png_path: str, cache_dir: Optional[str],
+                           max_edge: Optional[int] = None) -> Tuple[Optional[str], Optional[Dict]]:
+    """
+    Return (cache key, cached result) for a floor plan input.
+
+    URL inputs and calls with cache_dir None return (None, None) without
+    reading the image; otherwise the result is None on a cache miss.
+    """
+    if is_image_url(png_path) or not cache_dir:
+        return None, None
+    cache_key = response_cache_key(png_path, max_edge)
+    return cache_key, load_cached_response(cache_dir, cache_key)
+
+
+def load_cached_response(cache_dir: str, key: str) -> Optional[Dict]:
+    """Return the cached result for a key, or None on a miss or unreadable entry."""
+    cache_path = os.path.join(cache_dir, f"{key}.json")
+    if not os.path.exists(cache_path):
+        return None
+
+    try:
+        with open(cache_path, 'rb') as f:
+            result = json_loads(f.read())
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️  Ignoring unreadable cache entry {cache_path}: {e}")
+        return None
+
+    print(f"♻️  Using cached result: {cache_path}")
+
+    # Rebuild the in-memory fields that are not stored in the cache
+    return validate_and_fix_structure(result)
+
+
+def store_cached_response(cache_dir: str, key: str, result: Dict) -> None:
+    """Store a successful result in the response cache (failed results are skipped)."""
+    if result.get('error'):
+        return
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_path = os.path.join(cache_dir, f"{key}.json")
+        with open(cache_path, 'wb') as f:
+            f.write(json_dumps_bytes(public_fields(result)))
+    except OSError as e:
+        print(f"⚠️  Failed to write cache entry: {e}")
+
+
+def build_system_prompt(ttl: Optional[str] = None) -> List[Dict]:
+    """
+    Build the system prompt with a prompt cache breakpoint on the instructions.
+
+    Note: PROMPT_INSTRUCTIONS is currently about 700 tokens, below the 1024
+    token minimum MODEL caches, so the API ignores this breakpoint and every
+    request reports 0 cached tokens until the instructions grow past it.
+
+    Args:
+        ttl: Optional cache lifetime (e.g. "1h" for long batch jobs); the API
+             default of 5 minutes is used when omitted
+
+    Returns:
+        list: System content blocks for client.messages.create
+    """
+    cache_control = {"type": "ephemeral"}
+    if ttl:
+        cache_control["ttl"] = ttl
+
+    return [
+        {
+            "type": "text",
+            "text": PROMPT_INSTRUCTIONS,
+            "cache_control": cache_control
         }
+    ]
 
-    # Save to file if output path is provided
-    if output_path:
-        save_json_output(result, output_path)
 
-    # Print summary
-    print_summary(result)
+def print_cache_hit_rate(usages: List, verbose: bool = False) -> None:
+    """
+    Print the share of input tokens served from the prompt cache across requests.
 
-    return result
+    When no request read or wrote the cache (e.g. the system prompt is below
+    the model's minimum cacheable length), only a note is printed, and only
+    with verbose.
+    """
+    if not usages:
+        return
 
+    cache_read = sum(getattr(u, 'cache_read_input_tokens', None) or 0 for u in usages)
+    cache_write = sum(getattr(u, 'cache_creation_input_tokens', None) or 0 for u in usages)
+    uncached = sum(getattr(u, 'input_tokens', None) or 0 for u in usages)
+    total = cache_read + cache_write + uncached
+
+    if not cache_read and not cache_write:
+        if verbose:
+            print("ℹ️  Prompt cache inactive: no tokens were cached (is the system prompt "
+                  "shorter than the model's minimum cacheable length?)")
+        return
+
+    hit_rate = cache_read / total if total else 0.0
+    print(f"🗄️  Prompt cache hit rate: {hit_rate:.1%} of {total} input tokens "
+          f"across {len(usages)} requests")
 
-def clean_json_response(response_text: str) -> str:
-    """Remove markdown code blocks and clean up the JSON response."""
-    # Remove markdown code blocks
-    response_text = re.sub(r'```json\s*|\s*```', '', response_text)
-    response_text = re.sub(r'```\s*', '', response_text)
 
-    # Remove any leading/trailing whitespace
-    response_text = response_text.strip()
+def print_cache_usage(usage) -> None:
+    """Print prompt cache read/write token counts from a response usage block."""
+    cache_read = getattr(usage, 'cache_read_input_tokens', None) or 0
+    cache_write = getattr(usage, 'cache_creation_input_tokens', None) or 0
+    print(f"🗄️  Prompt cache: {cache_read} tokens read, {cache_write} tokens written")
 
-    # Find the first { and last } to extract just the JSON
+
+def clean_json_response(response_text: str) -> str:
+    """
+    Extract the JSON object from the response text.
+
+    Slicing from the first { to the last } also drops any markdown code
+    fences or explanation around the object.
+    """
     first_brace = response_text.find('{')
     last_brace = response_text.rfind('}')
 
     if first_brace != -1 and last_brace != -1:
-        response_text = response_text[first_brace:last_brace + 1]
+        return response_text[first_brace:last_brace + 1]
+
+    return response_text.strip()
+
+
+if msgspec is not None:
+    class PlanPoint(msgspec.Struct):
+        x: float = 0.0
+        y: float = 0.0
 
-    return response_text
+    class PlanWall(msgspec.Struct):
+        # UNSET tells a missing id (numbered below) apart from an explicit null (kept as None)
+        wall_id: Union[Optional[str], msgspec.UnsetType] = msgspec.UNSET
+        start_point: PlanPoint = msgspec.field(default_factory=PlanPoint)
+        end_point: PlanPoint = msgspec.field(default_factory=PlanPoint)
+
+    class PlanRoom(msgspec.Struct):
+        room_name: str = 'UNKNOWN'
+        center_point: PlanPoint = msgspec.field(default_factory=PlanPoint)
+
+    class Plan(msgspec.Struct):
+        walls: List[PlanWall] = []
+        rooms: List[PlanRoom] = []
+
+
+def decode_floorplan(response_text: str) -> Dict:
+    """
+    Parse and validate floor plan JSON.
+
+    With msgspec installed, well-formed responses are decoded straight into
+    typed structs in a single pass. Anything it rejects (malformed JSON or
+    loosely typed fields) goes through json_loads and validate_and_fix_structure.
+    """
+    if msgspec is not None:
+        try:
+            plan = msgspec.json.decode(response_text, type=Plan, strict=False)
+        except msgspec.DecodeError:
+            pass
+        else:
+            return plan_to_dict(plan)
+
+    return validate_and_fix_structure(json_loads(response_text))
+
+
+def plan_to_dict(plan: 'Plan') -> Dict:
+    """Convert a decoded Plan to the same structure validate_and_fix_structure returns."""
+    result = msgspec.to_builtins(plan)
+
+    # to_builtins leaves out UNSET fields, so only walls without a wall_id key get a default
+    walls = result['walls']
+    for i, wall in enumerate(walls):
+        if 'wall_id' not in wall:
+            walls[i] = {'wall_id': f'wall_{i + 1}', **wall}
+
+    for room in result['rooms']:
+        room['room_name'] = normalize_room_name(room['room_name'])
+
+    result['_walls_xy'] = walls_to_xy(result['walls'])
+    return result
+
+
+def normalize_room_name(name: str) -> str:
+    """Upper-case a room name, sharing one string object per distinct name across results."""
+    name = name.upper()
+    return ROOM_NAMES.get(name) or sys.intern(name)
 
 
 def validate_and_fix_structure(data: Dict) -> Dict:
@@ -235,7 +939,7 @@ def validate_and_fix_structure(data: Dict) -> Dict:
             continue
 
         validated_room = {
-            'room_name': room.get('room_name', 'UNKNOWN').upper(),
+            'room_name': normalize_room_name(room.get('room_name', 'UNKNOWN')),
             'center_point': {
                 'x': float(room.get('center_point', {}).get('x', 0)),
                 'y': float(room.get('center_point', {}).get('y', 0))
@@ -245,15 +949,50 @@ def validate_and_fix_structure(data: Dict) -> Dict:
 
     return {
         'walls': validated_walls,
-        'rooms': validated_rooms
+        'rooms': validated_rooms,
+        '_walls_xy': walls_to_xy(validated_walls)
     }
 
 
+def walls_to_xy(walls: List[Dict]) -> np.ndarray:
+    """
+    Pack wall coordinates into one contiguous array.
+
+    Returns:
+        np.ndarray: float64 array of shape (N, 4), one [start_x, start_y, end_x, end_y] row per wall
+        (float64 holds the parsed JSON values exactly, so threshold tests match the dicts)
+    """
+    xy = np.empty((len(walls), 4), dtype=np.float64)
+    for i, wall in enumerate(walls):
+        start, end = wall['start_point'], wall['end_point']
+        xy[i] = (start['x'], start['y'], end['x'], end['y'])
+    return xy
+
+
+def public_fields(data: Dict) -> Dict:
+    """Drop in-memory helper fields (keys starting with "_") before serializing."""
+    return {key: value for key, value in data.items() if not key.startswith('_')}
+
+
+def json_loads(data: Union[str, bytes]):
+    """Parse JSON with orjson when it is installed, else with the standard library."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps_bytes(data, indent: bool = False) -> bytes:
+    """Serialize JSON to UTF-8 bytes, keeping non-ASCII characters as-is."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(data, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
+
+
 def save_json_output(data: Dict, output_path: str) -> None:
     """Save the JSON data to a file with proper formatting."""
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with open(output_path, 'wb') as f:
+            f.write(json_dumps_bytes(public_fields(data), indent=True))
         print(f"✅ JSON saved to: {output_path}")
     except Exception as e:
         print(f"❌ Failed to save JSON: {e}")
@@ -290,7 +1029,7 @@ def print_summary(data: Dict) -> None:
 
     # Detect potential closely-spaced parallel walls
     print(f"\n🔍 Analyzing wall spacing...")
-    close_walls = detect_close_parallel_walls(walls)
+    close_walls = detect_close_parallel_walls(walls, walls_xy=data.get('_walls_xy'))
     if close_walls:
         print(f"   Found {len(close_walls)} pairs of closely-spaced parallel walls:")
         for pair in close_walls[:5]:  # Show first 5 pairs
@@ -301,42 +1040,57 @@ def print_summary(data: Dict) -> None:
     print("=" * 50 + "\n")
 
 
-def detect_close_parallel_walls(walls: List[Dict], threshold: float = 10.0) -> List[tuple]:
+def detect_close_parallel_walls(walls: List[Dict], threshold: float = 10.0,
+                                walls_xy: Optional[np.ndarray] = None) -> List[tuple]:
     """
     Detect pairs of walls that are parallel and close to each other.
 
+    All pairs are compared with vectorized NumPy operations, one block of
+    PAIR_BLOCK_SIZE walls at a time so the pairwise arrays stay small.
+
     Args:
         walls: List of wall dictionaries
         threshold: Maximum distance between parallel walls to be considered "close"
+        walls_xy: Optional float64 (N, 4) coordinate array for the walls, as built
+                  by walls_to_xy (rebuilt from `walls` when omitted or of another dtype)
 
     Returns:
         List of tuples: (wall_id_1, wall_id_2, distance)
     """
     close_pairs = []
+    count = len(walls)
+    if count < 2:
+        return close_pairs
+
+    # Rounded (e.g. float32) coordinates can flip the cross < 1.0 test, so only exact arrays are reused
+    if walls_xy is None or walls_xy.dtype != np.float64:
+        walls_xy = walls_to_xy(walls)
+    xy = walls_xy
 
-    for i, wall1 in enumerate(walls):
-        for wall2 in walls[i + 1:]:
-            # Calculate if walls are parallel
-            dx1 = wall1['end_point']['x'] - wall1['start_point']['x']
-            dy1 = wall1['end_point']['y'] - wall1['start_point']['y']
-            dx2 = wall2['end_point']['x'] - wall2['start_point']['x']
-            dy2 = wall2['end_point']['y'] - wall2['start_point']['y']
+    starts = xy[:, 0:2]
+    ends = xy[:, 2:4]
+    directions = ends - starts
+    # Simplified distance measure: distance between midpoints
+    midpoints = (starts + ends) / 2
 
-            # Check if parallel (cross product near zero)
-            cross = abs(dx1 * dy2 - dy1 * dx2)
+    for first in range(0, count, PAIR_BLOCK_SIZE):
+        last = min(first + PAIR_BLOCK_SIZE, count)
 
-            if cross < 1.0:  # Parallel threshold
-                # Calculate minimum distance between wall segments
-                # Simplified: distance between midpoints
-                mid1_x = (wall1['start_point']['x'] + wall1['end_point']['x']) / 2
-                mid1_y = (wall1['start_point']['y'] + wall1['end_point']['y']) / 2
-                mid2_x = (wall2['start_point']['x'] + wall2['end_point']['x']) / 2
-                mid2_y = (wall2['start_point']['y'] + wall2['end_point']['y']) / 2
+        # Compare walls first..last against themselves and every later wall
+        block_dirs = directions[first:last]
+        other_dirs = directions[first:]
 
-                distance = ((mid1_x - mid2_x) ** 2 + (mid1_y - mid2_y) ** 2) ** 0.5
+        # Check if parallel (cross product near zero)
+        cross = np.abs(block_dirs[:, 0:1] * other_dirs[None, :, 1] - block_dirs[:, 1:2] * other_dirs[None, :, 0])
+        distance = np.linalg.norm(midpoints[first:last, None, :] - midpoints[None, first:, :], axis=-1)
 
-                if distance < threshold:
-                    close_pairs.append((wall1['wall_id'], wall2['wall_id'], distance))
+        # Keep each pair once (second wall after the first)
+        later = np.arange(other_dirs.shape[0])[None, :] > np.arange(last - first)[:, None]
+        rows, cols = np.nonzero((cross < 1.0) & (distance < threshold) & later)
+
+        for row, col in zip(rows, cols):
+            close_pairs.append((walls[first + row]['wall_id'], walls[first + col]['wall_id'],
+                                float(distance[row, col])))
 
     return close_pairs
 
@@ -354,15 +1108,14 @@ def png_to_json_with_base64(png_path: str, output_path: Optional[str] = None) ->
         dict: JSON with image metadata and base64 data
     """
 
-    if not os.path.exists(png_path):
-        raise FileNotFoundError(f"Image file not found: {png_path}")
+    # One stat call both checks existence and provides the size
+    try:
+        file_size = os.stat(png_path).st_size
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Image file not found: {png_path}") from None
 
     # Read and encode the PNG file
-    with open(png_path, 'rb') as image_file:
-        image_data = base64.standard_b64encode(image_file.read()).decode('utf-8')
-
-    # Get file info
-    file_size = os.path.getsize(png_path)
+    image_data = encode_file_base64(png_path, file_size)
 
     # Create JSON structure
     result = {
@@ -387,11 +1140,18 @@ if __name__ == "__main__":
     result = floorplan_png_to_json(
         png_path="floorplan.png",
         api_key=None,  # Will use ANTHROPIC_API_KEY from .env
-        output_path="floorplan_output.json"
+        output_path="floorplan_output.json",
+        verbose=True
     )
 
     # Alternative: Convert PNG to base64 JSON (no API call)
     # base64_result = png_to_json_with_base64(
     #     png_path="floorplan.png",
     #     output_path="floorplan_base64.json"
-    # )
\ No newline at end of file
+    # )
+    # Alternative: Convert several floor plans concurrently
+    # batch_results = asyncio.run(floorplan_png_to_json_batch(
+    #     png_paths=["floorplan.png", "floor_plan.png"],
+    #     output_dir="floorplan_outputs",
+    #     concurrency=4
+    # ))
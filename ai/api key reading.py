@@ -77,27 +77,34 @@ else:
 # METHOD 6: Read .env file manually (without python-dotenv)
 # ============================================
 
+import re
+
+# KEY=value lines: everything before the first '=' is the key (so "export B" and "C-D" are
+# kept verbatim); lines starting with '#' never match
+ENV_LINE = re.compile(rb'^[ \t]*([^#=\s][^=\r\n]*)=([^\r\n]*)', re.M)
+
+
 def load_env_manually(filepath='.env'):
     """
     Manually parse .env file without external libraries
     """
-    env_vars = {}
     try:
-        with open(filepath, 'r') as f:
-            for line in f:
-                line = line.strip()
-                # Skip comments and empty lines
-                if line and not line.startswith('#'):
-                    # Split on first = sign
-                    if '=' in line:
-                        key, value = line.split('=', 1)
-                        # Remove quotes if present
-                        value = value.strip().strip('"').strip("'")
-                        env_vars[key.strip()] = value
-                        # Also set in os.environ
-                        os.environ[key.strip()] = value
+        with open(filepath, 'rb') as f:
+            content = f.read()
     except FileNotFoundError:
         print(f"Warning: {filepath} not found")
+        return {}
+
+    # Match every KEY=value line in one regex pass over the whole file
+    # (comments and empty lines never match)
+    env_vars = {}
+    for m in ENV_LINE.finditer(content):
+        # Remove quotes if present
+        env_vars[m.group(1).decode().strip()] = m.group(2).decode().strip().strip('"').strip("'")
+
+    # Also set in os.environ, in one update that skips values already set
+    # (each os.environ assignment calls putenv)
+    os.environ.update({key: value for key, value in env_vars.items() if os.environ.get(key) != value})
 
     return env_vars
 
@@ -1,177 +1,207 @@
-import json
+try:
+    # orjson parses with a C implementation; ujson is a lighter C fallback, then the standard library
+    from orjson import loads as _loads
+except ImportError:
+    try:
+        from ujson import loads as _loads
+    except ImportError:
+        from json import loads as _loads
+try:
+    # pysimdjson parses lazily: only the fields the draw loops read are materialized
+    import simdjson
+except ImportError:
+    simdjson = None
+try:
+    # Cairo strokes all walls as a single anti-aliased path; Pillow is the fallback
+    import cairo
+except ImportError:
+    cairo = None
+import io
+import math
+from functools import lru_cache
+import os
+import sys
+from xml.sax.saxutils import escape
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
 # JSON data
-json_data = '''
-{
-  "walls": [
-    {
-      "wall_id": "wall_1",
-      "start_point": {
-        "x": 45.12345678,
-        "y": 135.87654321
-      },
-      "end_point": {
-        "x": 45.12345678,
-        "y": 797.65432109
-      }
-    },
-    {
-      "wall_id": "wall_2",
-      "start_point": {
-        "x": 45.12345678,
-        "y": 797.65432109
-      },
-      "end_point": {
-        "x": 957.23456789,
-        "y": 797.65432109
-      }
-    },
-    {
-      "wall_id": "wall_3",
-      "start_point": {
-        "x": 957.23456789,
-        "y": 797.65432109
-      },
-      "end_point": {
-        "x": 957.23456789,
-        "y": 135.87654321
-      }
-    },
-    {
-      "wall_id": "wall_4",
-      "start_point": {
-        "x": 957.23456789,
-        "y": 135.87654321
-      },
-      "end_point": {
-        "x": 45.12345678,
-        "y": 135.87654321
-      }
-    },
-    {
-      "wall_id": "wall_5",
-      "start_point": {
-        "x": 45.12345678,
-        "y": 466.7654321
-      },
-      "end_point": {
-        "x": 501.18765432,
-        "y": 466.7654321
-      }
-    },
-    {
-      "wall_id": "wall_6",
-      "start_point": {
-        "x": 501.18765432,
-        "y": 135.87654321
-      },
-      "end_point": {
-        "x": 501.18765432,
-        "y": 350.23456789
-      }
-    },
-    {
-      "wall_id": "wall_7",
-      "start_point": {
-        "x": 501.18765432,
-        "y": 583.2956789
-      },
-      "end_point": {
-        "x": 501.18765432,
-        "y": 797.65432109
-      }
-    },
-    {
-      "wall_id": "wall_8",
-      "start_point": {
-        "x": 501.18765432,
-        "y": 466.7654321
-      },
-      "end_point": {
-        "x": 957.23456789,
-        "y": 466.7654321
-      }
-    }
-  ],
-  "rooms": [
-    {
-      "room_name": "BEDROOM",
-      "center_point": {
-        "x": 273.17901235,
-        "y": 301.32098765
-      }
-    },
-    {
-      "room_name": "LIVING",
-      "center_point": {
-        "x": 729.21111111,
-        "y": 301.32098765
-      }
-    },
-    {
-      "room_name": "OFFICE",
-      "center_point": {
-        "x": 273.17901235,
-        "y": 632.22530864
-      }
-    },
-    {
-      "room_name": "OFFICE",
-      "center_point": {
-        "x": 729.21111111,
-        "y": 632.22530864
-      }
-    }
-  ]
-}
-'''
+PLAN_JSON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'floor_plan.json')
+with open(PLAN_JSON_PATH, 'rb') as f:
+    json_data = f.read()
 
 # Parse JSON
-data = json.loads(json_data)
+if simdjson is not None:
+    # Keep the parser alive: the document proxies point into its buffer
+    parser = simdjson.Parser()
+    data = parser.parse(json_data)
+else:
+    data = _loads(json_data)
 
 # Create image with padding
 padding = 50
 width = 1100
 height = 900
+radius = 5  # room center marker
 
-# Create white background
-img = Image.new('RGB', (width, height), 'white')
-draw = ImageDraw.Draw(img)
+# Extract all wall endpoints in one pass: one (start_x, start_y, end_x, end_y) row per wall
+walls = np.array([
+    (wall['start_point']['x'], wall['start_point']['y'], wall['end_point']['x'], wall['end_point']['y'])
+    for wall in data['walls']
+], dtype=np.float32).reshape(-1, 4)
 
-# Draw walls
-for wall in data['walls']:
-    start_x = wall['start_point']['x']
-    start_y = wall['start_point']['y']
-    end_x = wall['end_point']['x']
-    end_y = wall['end_point']['y']
-    
-    draw.line([(start_x, start_y), (end_x, end_y)], fill='black', width=3)
+# Same for rooms: an (M, 2) array of center points plus a parallel list of names
+room_centers = np.array([
+    (room['center_point']['x'], room['center_point']['y'])
+    for room in data['rooms']
+], dtype=np.float32).reshape(-1, 2)
+room_names = [room['room_name'] for room in data['rooms']]
 
-# Draw rooms with labels
-try:
-    font = ImageFont.truetype("arial.ttf", 20)
-except:
-    font = ImageFont.load_default()
-
-for room in data['rooms']:
-    x = room['center_point']['x']
-    y = room['center_point']['y']
-    name = room['room_name']
-    
-    # Draw a small circle at center
-    radius = 5
-    draw.ellipse([(x-radius, y-radius), (x+radius, y+radius)], fill='red')
-    
-    # Draw room name
-    bbox = draw.textbbox((0, 0), name, font=font)
-    text_width = bbox[2] - bbox[0]
-    text_height = bbox[3] - bbox[1]
-    draw.text((x - text_width/2, y - text_height/2 - 15), name, fill='blue', font=font)
-
-# Save image
-img.save('floor_plan.png')
+
+
+def to_pixels(coords):
+    """
+    Round coordinates to int16 pixel positions for the Pillow rasterizer.
+
+    Arrays with values outside the int16 range are returned unchanged rather
+    than wrapping around.
+    """
+    rounded = np.rint(coords)
+    limits = np.iinfo(np.int16)
+    if rounded.size and (rounded.min() < limits.min or rounded.max() > limits.max):
+        return coords
+    return rounded.astype(np.int16)
+
+
+@lru_cache(maxsize=8)
+def _font(path, size):
+    """Load a TrueType font once per (path, size), falling back to Pillow's default."""
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def render_svg(walls, room_centers, room_names, output_path):
+    """Write walls and labelled rooms as an SVG document."""
+    buf = io.StringIO()
+    buf.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}">\n')
+    buf.write('<rect width="100%" height="100%" fill="white"/>\n')
+
+    # Draw walls
+    buf.write('<g stroke="black" stroke-width="3">\n')
+    for start_x, start_y, end_x, end_y in walls.tolist():
+        buf.write(f'<line x1="{start_x:g}" y1="{start_y:g}" x2="{end_x:g}" y2="{end_y:g}"/>\n')
+    buf.write('</g>\n')
+
+    # Draw room center markers
+    buf.write('<g fill="red">\n')
+    for x, y in room_centers.tolist():
+        buf.write(f'<circle cx="{x:g}" cy="{y:g}" r="{radius}"/>\n')
+    buf.write('</g>\n')
+
+    # Draw room names, centered 15px above the marker like the raster versions
+    buf.write('<g fill="blue" font-family="Arial" font-size="20" text-anchor="middle" dominant-baseline="central">\n')
+    for (x, y), name in zip(room_centers.tolist(), room_names):
+        buf.write(f'<text x="{x:g}" y="{y - 15:g}">{escape(name)}</text>\n')
+    buf.write('</g>\n')
+    buf.write('</svg>\n')
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(buf.getvalue())
+
+
+def render_cairo(walls, room_centers, room_names, output_path):
+    """Render walls and labelled rooms with Cairo and write a PNG."""
+    surface = cairo.ImageSurface(cairo.FORMAT_RGB24, width, height)
+    ctx = cairo.Context(surface)
+
+    # White background
+    ctx.set_source_rgb(1, 1, 1)
+    ctx.paint()
+
+    # Draw all walls as one path with a single stroke
+    ctx.set_source_rgb(0, 0, 0)
+    ctx.set_line_width(3)
+    for start_x, start_y, end_x, end_y in walls.tolist():
+        ctx.move_to(start_x, start_y)
+        ctx.line_to(end_x, end_y)
+    ctx.stroke()
+
+    # Draw rooms with labels
+    ctx.select_font_face("Arial", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+    ctx.set_font_size(20)
+
+    # Measure each distinct room name once; repeated names (e.g. two OFFICEs) share the extents
+    text_extents = {}
+    for name in set(room_names):
+        text_extents[name] = ctx.text_extents(name)[:4]
+
+    # Draw all room center markers as one path with a single fill
+    ctx.set_source_rgb(1, 0, 0)
+    for x, y in room_centers.tolist():
+        ctx.new_sub_path()
+        ctx.arc(x, y, radius, 0, 2 * math.pi)
+    ctx.fill()
+
+    # Draw room names, centered like the Pillow version (show_text starts at the baseline)
+    ctx.set_source_rgb(0, 0, 1)
+    for (x, y), name in zip(room_centers.tolist(), room_names):
+        x_bearing, y_bearing, text_width, text_height = text_extents[name]
+        ctx.move_to(x - text_width/2 - x_bearing, y - text_height/2 - 15 - y_bearing)
+        ctx.show_text(name)
+
+    surface.write_to_png(output_path)
+
+
+def render_pillow(walls, room_centers, room_names, output_path):
+    """Render walls and labelled rooms with Pillow and write a PNG."""
+    # Pillow draws on whole pixels; the SVG and Cairo outputs keep sub-pixel coordinates
+    walls = to_pixels(walls)
+    room_centers = to_pixels(room_centers)
+
+    # Create white background
+    img = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(img)
+
+    # Draw walls
+    for start_x, start_y, end_x, end_y in walls.tolist():
+        draw.line([(start_x, start_y), (end_x, end_y)], fill='black', width=3)
+
+    # Draw rooms with labels
+    font = _font("arial.ttf", 20)
+
+    # Measure each distinct room name once; repeated names (e.g. two OFFICEs) share the size
+    text_sizes = {}
+    for name in set(room_names):
+        bbox = draw.textbbox((0, 0), name, font=font)
+        text_sizes[name] = (bbox[2] - bbox[0], bbox[3] - bbox[1])
+
+    for (x, y), name in zip(room_centers.tolist(), room_names):
+        # Draw a small circle at center
+        draw.ellipse([(x-radius, y-radius), (x+radius, y+radius)], fill='red')
+
+        # Draw room name
+        text_width, text_height = text_sizes[name]
+        draw.text((x - text_width/2, y - text_height/2 - 15), name, fill='blue', font=font)
+
+    # Intermediate render: skip zlib's slow best-compression search
+    img.save(output_path, optimize=False, compress_level=1)
+
+
+# The SVG is a lossless vector copy alongside the PNG
+render_svg(walls, room_centers, room_names, 'floor_plan.svg')
+print("Image saved as 'floor_plan.svg'")
+
+# Render with Cairo when available, otherwise with Pillow
+if cairo is not None:
+    render_cairo(walls, room_centers, room_names, 'floor_plan.png')
+else:
+    render_pillow(walls, room_centers, room_names, 'floor_plan.png')
 print("Image saved as 'floor_plan.png'")
 
-# Display image (optional)
-img.show()
\ No newline at end of file
+# Display image (optional); only for interactive runs, show() forks an external viewer.
+# DISPLAY is X11-only, so it is checked on Linux alone
+interactive = __name__ == '__main__' and sys.stdout.isatty()
+if interactive and (not sys.platform.startswith('linux') or os.environ.get('DISPLAY')):
+    Image.open('floor_plan.png').show()
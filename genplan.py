@@ -1,6 +1,11 @@
 # Revit Python script — create walls from JSON definition
 # Works in pyRevit or RevitPythonShell
-import json
+try:
+    # orjson parses with a C implementation; fall back to the standard library
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+import os
 import sys
 
 # Try to get the Revit Document in several runtimes
@@ -33,70 +38,30 @@ from Autodesk.Revit.DB import *
 from Autodesk.Revit.UI import TaskDialog
 
 # --- JSON input (use your JSON) ---
-json_text = r'''
-{
-  "walls": [
-    {
-      "id": "ext_top",
-      "type": "exterior",
-      "start": [0, 20],
-      "end": [24, 20]
-    },
-    {
-      "id": "ext_bottom",
-      "type": "exterior",
-      "start": [0, 0],
-      "end": [24, 0]
-    },
-    {
-      "id": "ext_left",
-      "type": "exterior",
-      "start": [0, 0],
-      "end": [0, 20]
-    },
-    {
-      "id": "ext_right",
-      "type": "exterior",
-      "start": [24, 0],
-      "end": [24, 20]
-    },
-    {
-      "id": "int_vertical",
-      "type": "interior",
-      "start": [5, 0],
-      "end": [5, 20]
-    },
-    {
-      "id": "int_partition_1",
-      "type": "interior",
-      "start": [0, 13],
-      "end": [5, 13]
-    },
-    {
-      "id": "int_partition_2",
-      "type": "interior",
-      "start": [0, 7],
-      "end": [5, 7]
-    }
-  ],
-  "metadata": {
-    "units": "feet",
-    "width": 24,
-    "height": 20,
-    "description": "Floor plan sketch interpreted into wall segments."
-  }
-}
-'''
-data = json.loads(json_text)
+# Shared with genplan_rhinoinside.py; set FLOORPLAN_WALLS_JSON to load a different file
+try:
+    _script_dir = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # __file__ is undefined when pasted into a RevitPythonShell console, Dynamo or GhPython
+    _script_dir = os.getcwd()
+PLAN_JSON_PATH = os.environ.get("FLOORPLAN_WALLS_JSON") or os.path.join(_script_dir, "data", "floor_plan_walls.json")
+with open(PLAN_JSON_PATH, "rb") as f:
+    data = _loads(f.read())
 
 # --- Utility helpers ---
-def find_level_by_elevation(doc, elevation_feet, tol=1e-6):
+# Levels keyed by elevation (feet, rounded to LEVEL_ELEVATION_DIGITS); built on first lookup
+LEVEL_ELEVATION_DIGITS = 6
+_level_cache = None
+
+def find_level_by_elevation(doc, elevation_feet):
     """Return existing Level at elevation (feet) or None."""
-    collector = FilteredElementCollector(doc).OfClass(Level)
-    for lvl in collector:
-        if abs(lvl.Elevation - elevation_feet) < tol:
-            return lvl
-    return None
+    global _level_cache
+    if _level_cache is None:
+        _level_cache = {}
+        for lvl in FilteredElementCollector(doc).OfClass(Level):
+            # keep the first level at each elevation, as the original linear search did
+            _level_cache.setdefault(round(lvl.Elevation, LEVEL_ELEVATION_DIGITS), lvl)
+    return _level_cache.get(round(elevation_feet, LEVEL_ELEVATION_DIGITS))
 
 def get_or_create_base_level(doc, elevation_feet=0.0):
     lvl = find_level_by_elevation(doc, elevation_feet)
@@ -105,19 +70,27 @@ def get_or_create_base_level(doc, elevation_feet=0.0):
     # create new level
     lvl = Level.Create(doc, elevation_feet)
     lvl.Name = "Auto_Level_{:.2f}ft".format(elevation_feet)
+    _level_cache[round(elevation_feet, LEVEL_ELEVATION_DIGITS)] = lvl
     return lvl
 
+# Wall types keyed by name, plus the first type as fallback; built on first lookup
+_walltype_cache = None
+_first_walltype = None
+
 def pick_wall_type(doc, preferred_name=None):
-    collector = FilteredElementCollector(doc).OfClass(WallType)
-    types = list(collector)
-    if not types:
+    global _walltype_cache, _first_walltype
+    if _walltype_cache is None:
+        _walltype_cache = {}
+        for t in FilteredElementCollector(doc).OfClass(WallType):
+            if _first_walltype is None:
+                _first_walltype = t
+            _walltype_cache.setdefault(t.Name, t)
+    if _first_walltype is None:
         raise RuntimeError("No WallType found in document.")
-    if preferred_name:
-        for t in types:
-            if t.Name == preferred_name:
-                return t
+    if preferred_name and preferred_name in _walltype_cache:
+        return _walltype_cache[preferred_name]
     # fallback: return first wall type
-    return types[0]
+    return _first_walltype
 
 # --- Preparation: choose wall type and level ---
 # Optional: change to the exact wall type name you prefer present in your project
@@ -144,7 +117,20 @@ try:
     base_level = get_or_create_base_level(doc, elevation_feet=0.0)
     wall_type = pick_wall_type(doc, WALL_TYPE_NAME)
 
-    created = []
+    # Look these up once rather than for every wall
+    wall_type_id = wall_type.Id
+    level_id = base_level.Id
+    # Walls are created with the metadata height as their unconnected height,
+    # so no per-wall parameter edit is needed afterwards
+    wall_height = height_ft if height_ft is not None else 10.0
+
+    # Resolve the static methods once instead of a .NET attribute lookup per wall
+    # (this runs at module scope, so the aliases are globals, not fast locals)
+    _Line_CreateBound = Line.CreateBound
+    _Wall_Create = Wall.Create
+
+    # Pass 1: build all wall curves
+    curves = []
     for w in data.get("walls", []):
         sid = w.get("id", "wall")
         start = w.get("start")
@@ -153,47 +139,26 @@ try:
             print("Skipping wall {}: missing start/end".format(sid))
             continue
 
-        x1, y1 = float(start[0]), float(start[1])
-        x2, y2 = float(end[0]), float(end[1])
+        # JSON numbers already decode to int/float, which XYZ accepts as is
+        x1, y1 = start
+        x2, y2 = end
 
         # Revit XYZ: X = x, Y = y, Z = elevation (0)
-        p1 = XYZ(x1, y1, 0.0)
-        p2 = XYZ(x2, y2, 0.0)
-
-        curve = Line.CreateBound(p1, p2)
-
-        # Create the wall. The Wall.Create method needs a Document, Curve, WallTypeId, LevelId, height, offset, flip
-        # We will set unconnected height if metadata height exists, otherwise the WallType's default height is used.
-        new_wall = Wall.Create(doc, curve, wall_type.Id, base_level.Id, 10.0, 0.0, False, False)
-        # new_wall is created as unconnected; change UnconnectedHeight if metadata height provided
-        if height_ft is not None:
-            try:
-                # UnconnectedHeight property expects double in feet
-                new_wall.get_Parameter(BuiltInParameter.WALL_USER_HEIGHT_PARAM).Set(height_ft)
-            except Exception:
-                # Some walls use WALL_HEIGHT_TYPE or WALL_USER_HEIGHT_PARAM
-                try:
-                    param = new_wall.get_Parameter(BuiltInParameter.WALL_HEIGHT_TYPE)
-                    if param and not param.IsReadOnly:
-                        # attempting to set via this param will not accept a raw double; skip
-                        pass
-                except Exception:
-                    pass
-
-        # (optional) set the wall location line to center
-        try:
-            new_wall.get_Parameter(BuiltInParameter.WALL_KEY_REF_PARAM)  # just probe
-            # Set location line to center if available via Wall.Location
-            loc = new_wall.Location
-            # There is a LocationCurve, we can set its curve if needed — not required here.
-        except Exception:
-            pass
+        curves.append((sid, _Line_CreateBound(XYZ(x1, y1, 0.0), XYZ(x2, y2, 0.0))))
+
+    # Pass 2: create all walls. Wall.Create needs a Document, Curve, WallTypeId, LevelId,
+    # height, offset, flip and structural flag
+    created = [None] * len(curves)
+    for i, (sid, curve) in enumerate(curves):
+        new_wall = _Wall_Create(doc, curve, wall_type_id, level_id, wall_height, 0.0, False, False)
 
         # store id & element info
-        created.append((sid, new_wall.Id.IntegerValue))
-        print("Created wall '{}' -> ElementId {}".format(sid, new_wall.Id.IntegerValue))
+        created[i] = (sid, new_wall.Id.IntegerValue)
 
     t.Commit()
+    # Report all walls in one write; the host's stdout redirection is slow per call
+    if created:
+        sys.stdout.write("\n".join("Created wall '{}' -> ElementId {}".format(sid, eid) for sid, eid in created) + "\n")
     print("Created {} walls.".format(len(created)))
 
     # Provide a simple Revit UI notification if available
@@ -204,6 +169,8 @@ try:
 
 except Exception as ex:
     t.RollBack()
+    # Levels created in this transaction are gone after the rollback
+    _level_cache = None
     raise
 
 # end of script
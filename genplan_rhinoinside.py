@@ -1,7 +1,12 @@
 # Run inside Revit Python environment (pyRevit / RevitPythonShell)
 # Requires Rhino.Inside to be installed and loaded.
 
-import json
+try:
+    # orjson parses with a C implementation; fall back to the standard library
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+import os
 import sys
 import clr
 
@@ -19,61 +24,15 @@ import Rhino
 import scriptcontext as sc
 
 # --- JSON floor plan definition ---
-json_text = r'''
-{
-  "walls": [
-    {
-      "id": "ext_top",
-      "type": "exterior",
-      "start": [0, 20],
-      "end": [24, 20]
-    },
-    {
-      "id": "ext_bottom",
-      "type": "exterior",
-      "start": [0, 0],
-      "end": [24, 0]
-    },
-    {
-      "id": "ext_left",
-      "type": "exterior",
-      "start": [0, 0],
-      "end": [0, 20]
-    },
-    {
-      "id": "ext_right",
-      "type": "exterior",
-      "start": [24, 0],
-      "end": [24, 20]
-    },
-    {
-      "id": "int_vertical",
-      "type": "interior",
-      "start": [5, 0],
-      "end": [5, 20]
-    },
-    {
-      "id": "int_partition_1",
-      "type": "interior",
-      "start": [0, 13],
-      "end": [5, 13]
-    },
-    {
-      "id": "int_partition_2",
-      "type": "interior",
-      "start": [0, 7],
-      "end": [5, 7]
-    }
-  ],
-  "metadata": {
-    "units": "feet",
-    "width": 24,
-    "height": 20,
-    "description": "Floor plan sketch interpreted into wall segments."
-  }
-}
-'''
-data = json.loads(json_text)
+# Shared with genplan.py; set FLOORPLAN_WALLS_JSON to load a different file
+try:
+    _script_dir = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # __file__ is undefined when pasted into a RevitPythonShell console, Dynamo or GhPython
+    _script_dir = os.getcwd()
+PLAN_JSON_PATH = os.environ.get("FLOORPLAN_WALLS_JSON") or os.path.join(_script_dir, "data", "floor_plan_walls.json")
+with open(PLAN_JSON_PATH, "rb") as f:
+    data = _loads(f.read())
 
 # --- Prepare Rhino document ---
 rhino_doc = Rhino.RhinoDoc.ActiveDoc
@@ -92,18 +51,31 @@ rhino_doc.Layers.SetCurrentLayerIndex(layer_index)
 # --- Generate geometry ---
 created_ids = []
 
-for w in data["walls"]:
-    sid = w["id"]
-    x1, y1 = w["start"]
-    x2, y2 = w["end"]
+# Resolve the RhinoCommon attribute chains once instead of per wall
+# (this runs at module scope, so the aliases are globals, not fast locals)
+_Point3d = Rhino.Geometry.Point3d
+_LineCurve = Rhino.Geometry.LineCurve
+_AddCurve = rhino_doc.Objects.AddCurve
+
+# Record all curves as one undo step and hold off view updates until they are all added
+rhino_doc.Views.RedrawEnabled = False
+undo_record = rhino_doc.BeginUndoRecord("FloorPlan")
+try:
+    for w in data["walls"]:
+        sid = w["id"]
+        x1, y1 = w["start"]
+        x2, y2 = w["end"]
 
-    p1 = Rhino.Geometry.Point3d(x1, y1, 0)
-    p2 = Rhino.Geometry.Point3d(x2, y2, 0)
+        p1 = _Point3d(x1, y1, 0)
+        p2 = _Point3d(x2, y2, 0)
 
-    line_curve = Rhino.Geometry.LineCurve(p1, p2)
+        line_curve = _LineCurve(p1, p2)
 
-    obj_id = rhino_doc.Objects.AddCurve(line_curve)
-    created_ids.append(obj_id)
+        obj_id = _AddCurve(line_curve)
+        created_ids.append(obj_id)
+finally:
+    rhino_doc.EndUndoRecord(undo_record)
+    rhino_doc.Views.RedrawEnabled = True
 
 # --- Finalize ---
 rhino_doc.Views.Redraw()